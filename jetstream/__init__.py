@@ -11,12 +11,10 @@ __email__ = 'rrichholt@tgen.org'
 __version__ = '1.6.2'
 
 
-# Configure parallel library dependencies (Used by numpy)
-if 'OPENBLAS_NUM_THREADS' not in os.environ:
-    os.environ.update(OPENBLAS_NUM_THREADS='1')
-
-if 'MKL_NUM_THREADS' not in os.environ:
-    os.environ.update(MKL_NUM_THREADS='1')
+# Configure parallel library dependencies (Used by numpy), values that are
+# already set in the environment are left alone.
+os.environ.setdefault('OPENBLAS_NUM_THREADS', '1')
+os.environ.setdefault('MKL_NUM_THREADS', '1')
 
 
 # This is an attempt to monkey-patch the confuse.NotFoundError because the
@@ -92,4 +90,5 @@ def represent_str(dumper, data):
     return dumper.represent_scalar('tag:yaml.org,2002:str', data)
 
 yaml.add_representer(str, representer=represent_str)
+yaml.add_representer(str, representer=represent_str, Dumper=utils.yaml_dumper)
 
@@ -1,11 +1,106 @@
 import logging
 import asyncio
 import jetstream
-from asyncio import BoundedSemaphore, create_subprocess_shell, CancelledError
+from asyncio import create_subprocess_shell, CancelledError
+from collections import deque
 
 log = logging.getLogger('jetstream.local')
 
 
+class CountingSemaphore:
+    """Bounded semaphore that acquires or releases several units at once.
+
+    Tasks reserve all of their cpus in a single step, so two tasks can never
+    each hold part of the cpus that they need while waiting on the other.
+    Waiters are served in order, a large request at the front of the queue
+    will not be starved by smaller ones arriving later."""
+    def __init__(self, value):
+        self._value = value
+        self._bound = value
+        self._waiters = deque()
+
+    def __repr__(self):
+        return f'<CountingSemaphore: {self._value}/{self._bound}>'
+
+    def _wake_waiters(self):
+        while self._waiters:
+            n, fut = self._waiters[0]
+
+            if fut.done():
+                self._waiters.popleft()
+            elif n <= self._value:
+                self._waiters.popleft()
+                self._value -= n
+                fut.set_result(True)
+            else:
+                break
+
+    async def acquire(self, n=1):
+        if n > self._bound:
+            raise ValueError(f'Cannot acquire {n}, bound is {self._bound}')
+
+        if not self._waiters and n <= self._value:
+            self._value -= n
+            return True
+
+        fut = asyncio.get_event_loop().create_future()
+        self._waiters.append((n, fut))
+
+        try:
+            await fut
+        except CancelledError:
+            if not fut.cancelled():
+                # Acquired just before the cancellation was delivered
+                self.release(n)
+            self._wake_waiters()
+            raise
+
+        return True
+
+    def release(self, n=1):
+        if self._value + n > self._bound:
+            raise ValueError('CountingSemaphore released too many times')
+
+        self._value += n
+        self._wake_waiters()
+
+
+def open_task_files(stdin=None, stdout=None, stderr=None):
+    """Opens the files for a task's standard streams, any that are not given
+    are returned as None. If one of the files fails to open, the files that
+    were already opened will be closed before the error is raised.
+
+    Output files are opened unbuffered in binary mode, only the child
+    process writes to them. When stdout and stderr are the same path they
+    share one file, opening it twice would give each stream its own offset
+    and they would overwrite each other."""
+    fps = []
+    try:
+        fps.append(open(stdin, 'rb', buffering=0) if stdin else None)
+        fps.append(open(stdout, 'wb', buffering=0) if stdout else None)
+        if stderr and stderr == stdout:
+            fps.append(fps[1])
+        else:
+            fps.append(open(stderr, 'wb', buffering=0) if stderr else None)
+    except BaseException:
+        close_task_files(fps)
+        raise
+    return fps
+
+
+def close_task_files(fps):
+    for fp in set(fps):
+        if fp is not None:
+            fp.close()
+
+
+def _close_opened_task_files(future):
+    """Done callback that closes task files opened after spawn was
+    cancelled."""
+    if not future.cancelled() and future.exception() is None:
+        close_task_files(future.result())
+
+
 class LocalBackend(jetstream.backends.BaseBackend):
     def __init__(self, cpus=None, blocking_io_penalty=None):
         """The LocalBackend executes tasks as processes on the local machine.
@@ -26,11 +121,11 @@ class LocalBackend(jetstream.backends.BaseBackend):
                     or jetstream.utils.guess_local_cpus()
         self.bip = blocking_io_penalty \
                    or jetstream.settings['backends']['local']['blocking_io_penalty'].get(int)
-        self._cpu_sem = BoundedSemaphore(self.cpus)
+        self._cpu_sem = CountingSemaphore(self.cpus)
         log.info(f'LocalBackend initialized with {self.cpus} cpus')
 
     async def spawn(self, task):
-        log.debug('Spawn: {}'.format(task))
+        log.debug('Spawn: %s', task)
 
         if 'cmd' not in task.directives:
             return task.complete()
@@ -44,29 +139,25 @@ class LocalBackend(jetstream.backends.BaseBackend):
             raise RuntimeError('Task cpus greater than available cpus')
 
         try:
-            for i in range(task.directives.get('cpus', 0)):
-                await self._cpu_sem.acquire()
-                cpus_reserved += 1
+            if cpus:
+                await self._cpu_sem.acquire(cpus)
+                cpus_reserved = cpus
 
             stdin, stdout, stderr = self.get_fd_paths(task)
 
-            if stdin:
-                stdin_fp = open(stdin, 'r')
-                open_fps.append(stdin_fp)
-            else:
-                stdin_fp = None
-
-            if stdout:
-                stdout_fp = open(stdout, 'w')
-                open_fps.append(stdout_fp)
-            else:
-                stdout_fp = None
+            # Opening files can block for a long time on network filesystems,
+            # so they are opened in an executor to keep the event loop free.
+            # If spawn is cancelled while waiting, the files are closed as
+            # soon as the executor is done opening them.
+            opening = self.runner.loop.run_in_executor(
+                None, open_task_files, stdin, stdout, stderr)
+            try:
+                open_fps = await asyncio.shield(opening)
+            except CancelledError:
+                opening.add_done_callback(_close_opened_task_files)
+                raise
 
-            if stderr:
-                stderr_fp = open(stderr, 'w')
-                open_fps.append(stderr_fp)
-            else:
-                stderr_fp = None
+            stdin_fp, stdout_fp, stderr_fp = open_fps
 
             p = await self.subprocess_sh(
                 cmd,
@@ -94,11 +185,10 @@ class LocalBackend(jetstream.backends.BaseBackend):
             task.state['err'] = 'Runner cancelled Backend.spawn()'
             return task.fail(-15)
         finally:
-            for fp in open_fps:
-                fp.close()
+            close_task_files(open_fps)
 
-            for i in range(cpus_reserved):
-                self._cpu_sem.release()
+            if cpus_reserved:
+                self._cpu_sem.release(cpus_reserved)
 
             return task
 
@@ -110,7 +200,7 @@ class LocalBackend(jetstream.backends.BaseBackend):
 
         This will always use a shell to launch the subprocess, and it prefers
         /bin/bash (can be changed via arguments)"""
-        log.debug(f'subprocess_sh:\n{args}')
+        log.debug('subprocess_sh:\n%s', args)
 
         while 1:
             try:
@@ -1,21 +1,20 @@
 import asyncio
+import functools
 import itertools
 import json
 import logging
-import os
 import re
 import shlex
 import shutil
 import subprocess
-import tempfile
 import time
 from asyncio.subprocess import PIPE
-from datetime import datetime, timedelta
 from jetstream.backends import BaseBackend
 from jetstream import settings
 
 log = logging.getLogger('jetstream.slurm')
 sacct_delimiter = '\037'
+sacct_format = ('JobID', 'State', 'ExitCode')
 job_id_pattern = re.compile(r"^(?P<jobid>\d+)(_(?P<arraystepid>\d+))?(\.(?P<stepid>(\d+|batch|extern)))?$")
 
 
@@ -32,97 +31,154 @@ class SlurmBackend(BaseBackend):
     def __init__(
             self,
             sacct_frequency=60,
+            sacct_max_frequency=300,
             sbatch_args=None,
             sbatch_delay=0.1,
             sbatch_executable=None,
             sacct_fields=('JobID', 'Elapsed'),
+            sacct_allocations_only=False,
             job_monitor_max_fails=5):
         """SlurmBackend submits tasks as jobs to a Slurm batch cluster
 
         :param sacct_frequency: Frequency in seconds that job updates will
         be requested from sacct
+        :param sacct_max_frequency: Longest frequency in seconds that the
+        sacct updates will back off to while no jobs are changing state
         :param sbatch: path to the sbatch binary if not on PATH
+        :param sacct_fields: Extra sacct fields to record in the task state,
+        a list or a comma/space separated string, or "all"
+        :param sacct_allocations_only: Only request job allocation records
+        from sacct (sacct -X), this greatly reduces the number of rows when
+        jobs have several steps, but step-level fields like MaxRSS will no
+        longer be reported
         """
         super(SlurmBackend, self).__init__()
         self.sbatch_args = sbatch_args
         self.sbatch_executable = sbatch_executable
         self.sacct_frequency = sacct_frequency
-        self.sacct_fields = sacct_fields
+        self.sacct_max_frequency = max(
+            sacct_max_frequency or sacct_frequency, sacct_frequency)
+        self.sacct_fields = self._check_sacct_fields(sacct_fields)
+        self.sacct_allocations_only = sacct_allocations_only
         self.sbatch_delay = sbatch_delay
         self.job_monitor_max_fails = job_monitor_max_fails
         self.jobs = dict()
 
+        self._conf_sbatch_args = self._parse_sbatch_args(sbatch_args)
+
         self.coroutines = (self.job_monitor,)
-        self._next_update = datetime.now()
+        self._next_update = time.monotonic()
+        self._sacct_interval = sacct_frequency
+        self._last_sbatch = 0
+        self._sbatch_lock = asyncio.Lock()
+        self._has_jobs = asyncio.Event()
 
         if self.sbatch_executable is None:
             self.sbatch_executable = shutil.which('sbatch') or 'sbatch'
 
-        with open(os.devnull, 'w') as devnull:
-            subprocess.run(
-                [self.sbatch_executable, '--version'],
-                check=True,
-                stdout=devnull,
-                stderr=devnull
-            )
-
+        sbatch_version(self.sbatch_executable)
         log.info('SlurmBackend initialized')
 
+    def _check_sacct_fields(self, sacct_fields):
+        """sacct rejects the whole request if --format includes a field that
+        it does not recognize, so configured fields are checked against
+        "sacct --helpformat" once, and unknown fields are dropped."""
+        fields = parse_sacct_fields(sacct_fields)
+
+        if not fields or fields == 'all':
+            return fields
+
+        try:
+            known = sacct_helpformat()
+        except (OSError, subprocess.CalledProcessError) as e:
+            log.warning(f'Unable to check sacct fields, sacct --helpformat '
+                        f'failed: {e}')
+            return fields
+
+        return check_sacct_fields(fields, known)
+
     def _bump_next_update(self):
-        self._next_update = datetime.now() + timedelta(seconds=self.sacct_frequency)
-        log.debug(f'Next sacct update bumped to {self._next_update.isoformat()}')
+        self._next_update = time.monotonic() + self._sacct_interval
+        log.debug('Next sacct update bumped to %ss from now', self._sacct_interval)
+
+    def _backoff(self, changed):
+        """Jobs that run for a long time do not need to be checked at the
+        same rate as jobs that are changing state. The interval between sacct
+        updates doubles each time an update finds no state changes, up to
+        sacct_max_frequency, and resets when anything changes."""
+        if changed:
+            self._sacct_interval = self.sacct_frequency
+        else:
+            self._sacct_interval = min(
+                self._sacct_interval * 2, self.sacct_max_frequency)
+
+    @staticmethod
+    def _parse_sbatch_args(sbatch_args):
+        """Sbatch args can be given as a list, or as a string that will be
+        split with shlex.split"""
+        if sbatch_args is None:
+            return []
+        elif isinstance(sbatch_args, str):
+            return shlex.split(sbatch_args)
+        else:
+            return list(sbatch_args)
 
     def _get_sbatch_args(self, task):
         """Any extra args for sbatch will come from the application
         settings, followed by task settings. This means task settings
-        will be able to override application config settings."""
-        sbatch_args = []
-
-        conf_sbatch_args = self.sbatch_args
-        if conf_sbatch_args is None:
-            pass
-        elif isinstance(conf_sbatch_args, str):\
-            # It can be a pain to store args s
-            args = shlex.split(conf_sbatch_args)
-            sbatch_args.extend(args)
-        else:
-            sbatch_args.extend(conf_sbatch_args)
-
+        will be able to override application config settings. The
+        application settings are the same for every task, so they are only
+        parsed once when the backend is created."""
         task_sbatch_args = task.directives.get('sbatch_args')
-        if task_sbatch_args is None:
-            pass
-        elif isinstance(task_sbatch_args, str):
-            args = shlex.split(task_sbatch_args)
-            sbatch_args.extend(args)
-        else:
-            sbatch_args.extend(task_sbatch_args)
-
-        return sbatch_args
+        return self._conf_sbatch_args + self._parse_sbatch_args(task_sbatch_args)
 
     async def wait_for_next_update(self):
         """This allows the wait time to be bumped up each time a job is
         submitted. This means that sacct will never be checked immediately
         after submitting jobs, and it protects against finding data from
-        old jobs with the same job ID in the database"""
-        while datetime.now() < self._next_update:
-            sleep_delta = self._next_update - datetime.now()
-            sleep_seconds = max(0, sleep_delta.total_seconds())
-            await asyncio.sleep(sleep_seconds)
+        old jobs with the same job ID in the database. The deadline is a
+        monotonic clock reading, so it is unaffected by system clock changes,
+        and the monitor only wakes up again when it was moved while sleeping.
+        Sleeps are capped at sacct_frequency so that a deadline moved earlier
+        after backing off is still noticed."""
+        while 1:
+            remaining = self._next_update - time.monotonic()
+            if remaining <= 0:
+                return
+            await asyncio.sleep(min(remaining, self.sacct_frequency))
 
     async def job_monitor(self):
-        """Request job data updates from sacct for each job in self.jobs."""
+        """Request job data updates from sacct for each job in self.jobs.
+        While there are no jobs, the monitor sleeps until one is submitted
+        instead of waking up every sacct_frequency."""
         log.info('Slurm job monitor started!')
         failures = self.job_monitor_max_fails
         try:
             while 1:
-                await self.wait_for_next_update()
-
                 if not self.jobs:
+                    # Nothing to check until a job is submitted, and spawn
+                    # will have bumped the next update by then
                     log.debug('No current jobs to check')
-                    self._bump_next_update()
-                    continue
+                    self._has_jobs.clear()
+                    await self._has_jobs.wait()
+
+                await self.wait_for_next_update()
+
+                # sacct can take a while to respond when there are many
+                # jobs, so it runs in an executor to keep the loop free
+                request = functools.partial(
+                    sacct,
+                    *self.jobs,
+                    return_data=True,
+                    fields=self.sacct_fields or (),
+                    allocations=self.sacct_allocations_only
+                )
+
                 try:
-                    sacct_data = sacct(*self.jobs, return_data=True)
+                    sacct_data = await self.runner.loop.run_in_executor(
+                        None, request)
+                except asyncio.CancelledError:
+                    raise
                 except Exception:
                     if failures <= 0:
                         raise
@@ -134,16 +190,29 @@ class SlurmBackend(BaseBackend):
                     continue
 
                 failures = self.job_monitor_max_fails
-                self._bump_next_update()
 
+                changed = False
+                done = []
                 for jid, data in sacct_data.items():
-                    if jid in self.jobs:
-                        job = self.jobs[jid]
+                    job = self.jobs.get(jid)
+                    if job is not None:
+                        previous = job.job_data
+                        if previous is None \
+                                or previous.get('State') != data.get('State'):
+                            changed = True
+
                         job.job_data = data
 
-                        if job.is_done() and job.event is not None:
-                            job.event.set()
-                            self.jobs.pop(jid)
+                        if job.is_done():
+                            done.append(jid)
+
+                for jid in done:
+                    future = self.jobs.pop(jid).future
+                    if not future.done():
+                        future.set_result(None)
+
+                self._backoff(changed)
+                self._bump_next_update()
         finally:
             log.info('Slurm job monitor stopped!')
 
@@ -153,7 +222,7 @@ class SlurmBackend(BaseBackend):
         """
         count = next(self.count)
         run_id = self.runner.run_id
-        return '{}.{}'.format(run_id, count)
+        return f'{run_id}.{count}'
 
     def slurm_job_comment(self, task):
         """Slurm jobs will receive a comment that contains details about the
@@ -174,7 +243,9 @@ class SlurmBackend(BaseBackend):
         # but possible. It would probably be best to enforce this limit at
         # the Task level though.
 
-        comment_string = json.dumps(comment, sort_keys=True)
+        # Compact separators leave more of the comment limit for tags
+        comment_string = json.dumps(
+            comment, sort_keys=True, separators=(',', ':'))
         return comment_string
 
     def cancel(self):
@@ -183,51 +254,94 @@ class SlurmBackend(BaseBackend):
             log.info(f'Requesting scancel for {len(jobs)} slurm jobs')
             subprocess.run(['scancel'] + jobs)
 
+    def _track_job(self, task, job, stdout, stderr):
+        """Records a submitted job on the task and adds it to the jobs that
+        the job monitor checks. The job monitor resolves job.future when
+        sacct reports that the job is done, only the spawns for finished
+        jobs are woken up."""
+        task.state.update(
+            label=f'Slurm({job.jid})',
+            stdout_path=stdout,
+            stderr_path=stderr,
+            slurm_job_id=job.jid,
+            slurm_cmd=' '.join(shlex.quote(a) for a in job.args)
+        )
+
+        job.future = self.runner.loop.create_future()
+        self.jobs[job.jid] = job
+        self._has_jobs.set()
+
     async def spawn(self, task):
-        log.debug(f'Spawn: {task.name}')
+        log.debug('Spawn: %s', task.name)
+        directives = task.directives
+        cmd = directives.get('cmd')
 
-        if not task.directives.get('cmd'):
+        if not cmd:
             return task.complete()
 
-        # sbatch breaks when called too frequently, so this places
-        # a hard limit on the frequency of sbatch calls.
-        time.sleep(self.sbatch_delay)
-
         stdin, stdout, stderr = self.get_fd_paths(task)
         additional_args = self._get_sbatch_args(task)
 
-        job = sbatch(
-            cmd=task.directives['cmd'],
+        submit = functools.partial(
+            sbatch,
+            cmd=cmd,
             name=task.name,
             stdin=stdin,
             stdout=stdout,
             stderr=stderr,
             comment=self.slurm_job_comment(task),
-            cpus_per_task=task.directives.get('cpus'),
-            mem=task.directives.get('mem'),
-            walltime=task.directives.get('walltime'),
+            cpus_per_task=directives.get('cpus'),
+            mem=directives.get('mem'),
+            walltime=directives.get('walltime'),
             additional_args=additional_args,
             sbatch_executable=self.sbatch_executable
         )
 
-        task.state.update(
-            label=f'Slurm({job.jid})',
-            stdout_path=stdout,
-            stderr_path=stderr,
-            slurm_job_id=job.jid,
-            slurm_cmd=' '.join(shlex.quote(a) for a in job.args)
-        )
+        # sbatch breaks when called too frequently, so this places
+        # a hard limit on the frequency of sbatch calls. Submissions take
+        # turns with the lock and wait out the remainder of the delay since
+        # the last one. sbatch itself runs in an executor so that the event
+        # loop is never blocked while waiting for the controller.
+        async with self._sbatch_lock:
+            elapsed = time.monotonic() - self._last_sbatch
+            if elapsed < self.sbatch_delay:
+                await asyncio.sleep(self.sbatch_delay - elapsed)
+
+            submitting = self.runner.loop.run_in_executor(None, submit)
+            try:
+                job = await asyncio.shield(submitting)
+            except asyncio.CancelledError:
+                # The executor cannot be interrupted, sbatch still runs to
+                # completion. Wait for it and track the job before
+                # re-raising, so that it is in self.jobs like any other
+                # job that was running when the spawn was cancelled, and
+                # cancel() can still scancel it.
+                while not submitting.done():
+                    try:
+                        await asyncio.wait((submitting,))
+                    except asyncio.CancelledError:
+                        pass
+
+                if submitting.exception() is None:
+                    self._track_job(task, submitting.result(), stdout, stderr)
+                else:
+                    log.error(
+                        f'sbatch failed for cancelled task {task.name}: '
+                        f'{submitting.exception()}')
+                raise
+            finally:
+                self._last_sbatch = time.monotonic()
 
+        self._track_job(task, job, stdout, stderr)
+        self._backoff(changed=True)
         self._bump_next_update()
         log.info(f'SlurmBackend submitted({job.jid}): {task.name}')
+        await job.future
+        log.debug('%s: job info was updated', task.name)
 
-        job.event = asyncio.Event(loop=self.runner.loop)
-        self.jobs[job.jid] = job
-
-        await job.event.wait()
-        log.debug(f'{task.name}: job info was updated')
-
-        if self.sacct_fields:
+        if self.sacct_fields == 'all':
+            task.state['slurm_sacct'] = dict(job.job_data)
+        elif self.sacct_fields:
             job_info = {k: v for k, v in job.job_data.items() if
                         k in self.sacct_fields}
             task.state['slurm_sacct'] = job_info
@@ -239,53 +353,55 @@ class SlurmBackend(BaseBackend):
             log.info(f'Failed: {task.name}')
             task.fail(job.returncode())
 
-        log.debug(f'Slurmbackend returning task: {task.name}')
+        log.debug('Slurmbackend returning task: %s', task.name)
         return task
 
 
 class SlurmBatchJob(object):
-    states = {
-        'BOOT_FAIL': 'Job terminated due to launch failure, typically due to a '
-                     'hardware failure (e.g. unable to boot the node or block '
-                     'and the job can not be requeued).',
-        'CANCELLED': 'Job was explicitly cancelled by the user or system '
-                     'administrator. The job may or may not have been '
-                     'initiated.',
-        'COMPLETED': 'Job has terminated all processes on all nodes with an '
-                     'exit code of zero.',
-        'CONFIGURING': 'Job has been allocated resources, but are waiting for '
-                       'them to become ready for use (e.g. booting).',
-        'COMPLETING': 'Job is in the process of completing. Some processes on '
-                      'some nodes may still be active.',
-        'FAILED': 'Job terminated with non-zero exit code or other failure '
-                  'condition.',
-        'NODE_FAIL': 'Job terminated due to failure of one or more allocated '
-                     'nodes.',
-        'PENDING': 'Job is awaiting resource allocation.',
-        'PREEMPTED': 'Job terminated due to preemption.',
-        'REVOKED': 'Sibling was removed from cluster due to other cluster '
-                   'starting the job.',
-        'RUNNING': 'Job currently has an allocation.',
-        'SPECIAL_EXIT': 'The job was requeued in a special state. This state '
-                        'can be set by users, typically in EpilogSlurmctld, if '
-                        'the job has terminated with a particular exit value.',
-        'STOPPED': 'Job has an allocation, but execution has been stopped with '
-                   'SIGSTOP signal. CPUS have been retained by this job.',
-        'SUSPENDED': 'Job has an allocation, but execution has been suspended '
-                     'and CPUs have been released for other jobs.',
-        'TIMEOUT': 'Job terminated upon reaching its time limit.'
-    }
-
-    active_states = {'CONFIGURING', 'COMPLETING', 'RUNNING', 'SPECIAL_EXIT',
-                     'PENDING'}
-
-    inactive_states = {'BOOT_FAIL', 'CANCELLED', 'COMPLETED', 'FAILED',
-                       'NODE_FAIL', 'PREEMPTED', 'REVOKED',
-                       'STOPPED', 'SUSPENDED', 'TIMEOUT'}
-
-    failed_states = {'BOOT_FAIL', 'CANCELLED', 'FAILED', 'NODE_FAIL'}
-
-    passed_states = {'COMPLETED'}
+    """Tracks the sacct data for a single slurm batch job. Job states are
+    grouped into the sets below, descriptions are from the sacct man page:
+
+    BOOT_FAIL: Job terminated due to launch failure, typically due to a
+        hardware failure (e.g. unable to boot the node or block and the job
+        can not be requeued).
+    CANCELLED: Job was explicitly cancelled by the user or system
+        administrator. The job may or may not have been initiated.
+    COMPLETED: Job has terminated all processes on all nodes with an exit
+        code of zero.
+    CONFIGURING: Job has been allocated resources, but are waiting for them
+        to become ready for use (e.g. booting).
+    COMPLETING: Job is in the process of completing. Some processes on some
+        nodes may still be active.
+    FAILED: Job terminated with non-zero exit code or other failure
+        condition.
+    NODE_FAIL: Job terminated due to failure of one or more allocated nodes.
+    PENDING: Job is awaiting resource allocation.
+    PREEMPTED: Job terminated due to preemption.
+    REVOKED: Sibling was removed from cluster due to other cluster starting
+        the job.
+    RUNNING: Job currently has an allocation.
+    SPECIAL_EXIT: The job was requeued in a special state. This state can be
+        set by users, typically in EpilogSlurmctld, if the job has terminated
+        with a particular exit value.
+    STOPPED: Job has an allocation, but execution has been stopped with
+        SIGSTOP signal. CPUS have been retained by this job.
+    SUSPENDED: Job has an allocation, but execution has been suspended and
+        CPUs have been released for other jobs.
+    TIMEOUT: Job terminated upon reaching its time limit.
+    """
+
+    active_states = frozenset({'CONFIGURING', 'COMPLETING', 'RUNNING',
+                               'SPECIAL_EXIT', 'PENDING'})
+
+    inactive_states = frozenset({'BOOT_FAIL', 'CANCELLED', 'COMPLETED',
+                                 'FAILED', 'NODE_FAIL', 'PREEMPTED',
+                                 'REVOKED', 'STOPPED', 'SUSPENDED',
+                                 'TIMEOUT'})
+
+    failed_states = frozenset({'BOOT_FAIL', 'CANCELLED', 'FAILED',
+                               'NODE_FAIL'})
+
+    passed_states = frozenset({'COMPLETED'})
 
     def __init__(self, jid=None, data=None):
         self.args = None
@@ -306,7 +422,7 @@ class SlurmBatchJob(object):
             return other.jid == self.jid
 
     def __repr__(self):
-        return '<SlurmBatchJob: {}>'.format(self.jid)
+        return f'<SlurmBatchJob: {self.jid}>'
 
     def _update_state(self, job_data):
         self._job_data = job_data
@@ -315,7 +431,7 @@ class SlurmBatchJob(object):
         data = launch_sacct(self.jid)
 
         if not self.jid in data:
-            raise ValueError('No job data found for:  {}'.format(self.jid))
+            raise ValueError(f'No job data found for:  {self.jid}')
         else:
             self.job_data = data[self.jid]
 
@@ -338,8 +454,8 @@ class SlurmBatchJob(object):
             raise ValueError('Job not done yet')
 
         try:
-            return int(self.job_data['ExitCode'].partition(':')[0])
-        except (KeyError, IndexError):
+            return int(self._job_data['ExitCode'].partition(':')[0])
+        except (KeyError, ValueError):
             if self.is_ok():
                 return 0
             else:
@@ -352,21 +468,34 @@ class SlurmBatchJob(object):
 
     def is_done(self):
         if self._job_data:
-            state = self._job_data.get('State')
-
-            if state not in self.active_states:
-                return True
+            return self._job_data.get('State') not in self.active_states
 
         return False
 
     def is_ok(self):
-        if not self.is_done():
+        if not self._job_data:
             raise ValueError('Job is not complete yet.')
 
-        if self.job_data['State'] in self.passed_states:
-            return True
-        else:
-            return False
+        state = self._job_data.get('State')
+        if state in self.active_states:
+            raise ValueError('Job is not complete yet.')
+
+        return state in self.passed_states
+
+
+@functools.lru_cache()
+def sbatch_version(sbatch_executable='sbatch'):
+    """Returns the version reported by "sbatch --version". This also serves
+    as a check that sbatch is available. Results are cached per executable so
+    that constructing more than one backend does not repeat the call, failed
+    checks are not cached."""
+    p = subprocess.run(
+        [sbatch_executable, '--version'],
+        check=True,
+        stdout=PIPE,
+        stderr=subprocess.DEVNULL
+    )
+    return p.stdout.decode().strip()
 
 
 def wait(*job_ids, update_frequency=10):
@@ -380,44 +509,100 @@ def wait(*job_ids, update_frequency=10):
             time.sleep(update_frequency)
 
 
-def sacct(*job_ids, chunk_size=1000, strict=False, return_data=False):
+def parse_sacct_fields(fields):
+    """Returns the sacct fields as a tuple, or "all". Fields can be given as
+    a list, or as a comma or space separated string like the sacct --format
+    option."""
+    if not fields:
+        return ()
+
+    if isinstance(fields, str):
+        fields = re.split(r'[\s,]+', fields)
+
+    fields = tuple(f for f in fields if f)
+
+    if any(f.lower() == 'all' for f in fields):
+        return 'all'
+    else:
+        return fields
+
+
+def check_sacct_fields(fields, known):
+    """Returns the fields that are in known, with the spelling used by sacct.
+    sacct field names are case insensitive, unknown fields are dropped with
+    a warning."""
+    known = {k.lower(): k for k in known}
+    checked = []
+
+    for field in fields:
+        try:
+            checked.append(known[field.lower()])
+        except KeyError:
+            log.warning(f'Ignoring unknown sacct field: {field}')
+
+    return tuple(checked)
+
+
+def sacct_helpformat():
+    """Returns the field names accepted by "sacct --format" on this
+    system"""
+    p = subprocess.run(
+        ['sacct', '--helpformat'],
+        check=True,
+        stdout=PIPE,
+        stderr=subprocess.DEVNULL
+    )
+    return p.stdout.decode().split()
+
+
+def sacct(*job_ids, chunk_size=5000, strict=False, return_data=False,
+          fields=sacct_format, allocations=False):
     """Query sacct for job records.
 
     Jobs are returned for each job id, but steps will be combined under a
     single job id object. This will return a placeholder job for any job
     id given, regardless of whether job data was returned by sacct. The
     strict option can be used to raise an error when job data is missing
-    for any of the job ids."""
+    for any of the job ids. Fields and allocations are passed to
+    launch_sacct(). Job ids are sent as a single comma separated argument,
+    chunk_size keeps that argument well under the kernel's limit on the
+    length of a single argument (128KiB on Linux)."""
     if not job_ids:
         raise ValueError('Missing required argument: job_ids')
 
-    job_ids = [str(jid) for jid in job_ids]
-    jobs = [SlurmBatchJob(jid) for jid in job_ids]
-
+    # Chunks are taken straight from the job ids as they are requested,
+    # rather than by slicing a full copy of the job id list
+    remaining = map(str, job_ids)
     data = {}
-    for i in range(0, len(job_ids), chunk_size):
-        chunk = job_ids[i: i + chunk_size]
-        sacct_output = launch_sacct(*chunk)
+    while 1:
+        chunk = list(itertools.islice(remaining, chunk_size))
+        if not chunk:
+            break
+
+        sacct_output = launch_sacct(
+            *chunk, fields=fields, allocations=allocations)
         data.update(sacct_output)
 
-    log.debug('Status updates for {} jobs'.format(len(data)))
+    log.debug('Status updates for %s jobs', len(data))
 
     if return_data:
         return data
 
+    jobs = [SlurmBatchJob(jid) for jid in job_ids]
     for job in jobs:
         if not job.jid in data:
             if strict:
-                raise ValueError('No records returned for {}'.format(job.jid))
+                raise ValueError(f'No records returned for {job.jid}')
             else:
-                log.debug('No records found for {}'.format(job.jid))
+                log.debug('No records found for %s', job.jid)
         else:
             job.job_data = data[job.jid]
 
     return jobs
 
 
-def launch_sacct(*job_ids, delimiter=sacct_delimiter, raw=False):
+def launch_sacct(*job_ids, delimiter=sacct_delimiter, raw=False,
+                 fields=sacct_format, allocations=False):
     """Launch sacct command and return stdout data
 
     This function returns raw query results, sacct() will be more
@@ -426,15 +611,36 @@ def launch_sacct(*job_ids, delimiter=sacct_delimiter, raw=False):
     :param job_ids: Job ids to include in the query
     :param delimiter: Delimiter to separate parsable results data
     :param raw: Return raw stdout instead of parsed
+    :param fields: Fields to request with sacct --format, as a list or a
+        comma/space separated string, or "all". The
+        fields in sacct_format are always requested because SlurmBatchJob
+        needs them to determine job status.
+    :param allocations: Only request job allocation records (sacct -X), job
+        steps will not be included in the results
     :return: Dict or Bytes
     """
-    log.debug('Sacct request for {} jobs...'.format(len(job_ids)))
-    args = ['sacct', '-P', '--format', 'all', '--delimiter={}'.format(delimiter)]
+    log.debug('Sacct request for %s jobs...', len(job_ids))
 
-    for jid in job_ids:
-        args.extend(['-j', str(jid)])
+    fields = parse_sacct_fields(fields)
+    if fields == 'all':
+        fmt = 'all'
+    else:
+        fmt = ','.join(dict.fromkeys(sacct_format + fields))
+
+    args = ['sacct', '-P', '--format', fmt,
+            f'--delimiter={delimiter}']
+
+    if allocations:
+        args.append('-X')
+
+    # sacct accepts a comma separated list of job ids, one argument keeps
+    # the command line short regardless of how many jobs are requested.
+    if job_ids:
+        args.extend(['-j', ','.join(map(str, job_ids))])
+
+    if log.isEnabledFor(logging.DEBUG):
+        log.debug('Launching: %s', ' '.join([shlex.quote(r) for r in args]))
 
-    log.debug('Launching: {}'.format(' '.join([shlex.quote(r) for r in args])))
     p = subprocess.run(args, stdout=PIPE, check=True)
 
     if raw:
@@ -448,13 +654,22 @@ def parse_sacct(data, delimiter=sacct_delimiter, id_pattern=job_id_pattern):
     jobs = dict()
     lines = iter(data.splitlines())
     header = next(lines).split(delimiter)
+    maxsplit = len(header) - 1
+    match_id = id_pattern.match
 
     for line in lines:
-        row = dict(zip(header, line.split(delimiter)))
+        row = dict(zip(header, line.split(delimiter, maxsplit)))
 
         try:
-            match = id_pattern.match(row['JobID'])
-            groups = match.groupdict()
+            job_id = row['JobID']
+
+            if job_id.isdigit():
+                # Most rows are plain job ids, these skip the regex
+                jid, arraystepid, stepid = job_id, None, None
+            else:
+                match = match_id(job_id)
+                jid, arraystepid, stepid = match.group(
+                    'jobid', 'arraystepid', 'stepid')
         except (KeyError, AttributeError):
             # Job data restrictions are very loose - there is a small chance
             # that the chosen delimiter was added to some field in the job
@@ -467,19 +682,15 @@ def parse_sacct(data, delimiter=sacct_delimiter, id_pattern=job_id_pattern):
         # is to group all job steps (tasks, array steps) under their
         # corresponding jid. The steps are added to a list under the key
         # "_steps", all other data updates the dictionary.
-        jid = groups['jobid']
-
-        if groups['stepid'] or groups['arraystepid']:
-            if jid not in jobs:
-                jobs[jid] = {'_steps': list()}
+        job = jobs.get(jid)
+        if job is None:
+            job = jobs[jid] = {'_steps': list()}
 
-            jobs[jid]['_steps'].append(row)
+        if stepid or arraystepid:
+            job['_steps'].append(row)
         else:
-            if jid not in jobs:
-                jobs[jid] = dict()
-
             row['_steps'] = list()
-            jobs[jid].update(row)
+            job.update(row)
 
     return jobs
 
@@ -528,19 +739,22 @@ def sbatch(cmd, name=None, stdin=None, stdout=None, stderr=None, tasks=None,
     if cmd.startswith('#!'):
         script = cmd
     else:
-        script = '#!/bin/bash\n{}'.format(cmd)
+        script = f'#!/bin/bash\n{cmd}'
 
-    temp = tempfile.NamedTemporaryFile()
-    with open(temp.name, 'w') as fp:
-        fp.write(script)
-
-    args.append(temp.name)
+    # sbatch reads the batch script from stdin when no script path is given,
+    # so the script never needs to be written to the filesystem.
     args = [str(r) for r in args]
+    script_data = script.encode()
 
     remaining_tries = int(retry)
     while 1:
         try:
-            p = subprocess.run(args, stdout=subprocess.PIPE, check=True)
+            p = subprocess.run(
+                args,
+                input=script_data,
+                stdout=subprocess.PIPE,
+                check=True
+            )
             break
         except subprocess.CalledProcessError:
             if remaining_tries > 0:
@@ -152,13 +152,17 @@ def find_pipelines(*dirs):
             continue
 
         log.debug(f'Searching for pipelines in: {dirname}')
-        for filename in os.listdir(dirname):
-            path = os.path.join(dirname, filename)
 
+        # A single scandir pass gives the entry types along with the names,
+        # so only directories need the extra check for a manifest.
+        with os.scandir(dirname) as entries:
+            subdirs = [e.path for e in entries if e.is_dir()]
+
+        for path in subdirs:
             # Here we check if the item is likely to be a pipeline, this filters
             # out standard files, and prevents trying to instantiate and validate
             # a pipeline object for every directory we encounter.
-            if is_pipeline(path):
+            if os.path.exists(os.path.join(path, MANIFEST_FILENAME)):
                 try:
                     p = Pipeline(path)
                     log.debug(f'Found {p} at {path}')
@@ -113,12 +113,18 @@ class Project:
 
     def history_iter(self):
         yield self.index
-        for f in os.listdir(self.paths.history_dir):
-            try:
-                path = os.path.join(self.paths.history_dir, f)
-                yield jetstream.utils.load_yaml(path)
-            except jetstream.utils.yaml.YAMLError:
-                log.exception(f'Failed to load history file: {path}')
+        # scandir entries already carry the full path and file type, so
+        # anything that is not a regular file can be skipped without a stat
+        with os.scandir(self.paths.history_dir) as entries:
+            for entry in entries:
+                if not entry.is_file():
+                    continue
+
+                path = entry.path
+                try:
+                    yield jetstream.utils.load_yaml(path)
+                except jetstream.utils.yaml.YAMLError:
+                    log.exception(f'Failed to load history file: {path}')
 
     @property
     def is_locked(self):
@@ -18,7 +18,7 @@ def sigterm_ignored():
     """Context manager that temporarily catches SIGTERM signals and raises
     a KeyboardInterrupt instead."""
     def signal_handler(signum, frame):
-        log.debug(f'SIGNAL received: {signum}!')
+        log.debug('SIGNAL received: %s!', signum)
         raise KeyboardInterrupt
 
     original_sigint_handler = signal.getsignal(signal.SIGTERM)
@@ -53,7 +53,7 @@ class Runner:
         self._conc_sem = None
         self._condition = None
         self._errs = False
-        self._futures = []
+        self._futures = set()
         self._main = None
         self._previous_directory = None
         self._run_started = None
@@ -81,13 +81,19 @@ class Runner:
     def workflow(self):
         return self._workflow
 
-    # Synchronization methods for events that should wait on tasks to return
+    # Synchronization methods for events that should wait on tasks to return.
+    # The autosaver and the task spawner each get their own event so that
+    # neither one can clear a notification before the other has seen it.
     def notify_waiters(self):
         self._event.set()
+        self._ready.set()
 
     async def wait_for_next_task_future(self, timeout=None):
-        self._event.clear()
+        """Waits until a task future has returned since the last call. The
+        event is only cleared after it is seen, so a future that returned
+        while the caller was busy still counts."""
         await asyncio.wait_for(self._event.wait(), timeout=timeout)
+        self._event.clear()
 
     async def _autosave_coro(self):
         try:
@@ -101,14 +107,14 @@ class Runner:
                 # the minimum interval is reached.
                 time_since_last = datetime.now() - last_save
                 delay_for = mn - time_since_last
-                log.debug(f'Autosaver hold for {delay_for}')
+                log.debug('Autosaver hold for %s', delay_for)
                 await asyncio.sleep(delay_for.seconds)
 
                 # Otherwise, wait for the next future to return and then save
                 # but do not wait longer than autosave_max
                 timeout_at = last_save + mx
                 timeout_in = (timeout_at - datetime.now()).seconds
-                log.debug(f'Autosaver next save in {timeout_in}s')
+                log.debug('Autosaver next save in %ss', timeout_in)
 
                 try:
                     await self.wait_for_next_task_future(timeout=timeout_in)
@@ -134,10 +140,10 @@ class Runner:
         else:
             futures = asyncio.all_tasks(self.loop)
 
-        log.debug(f'{len(futures)} outstanding futures to cancel')
+        log.debug('%s outstanding futures to cancel', len(futures))
         if futures:
             for task in futures:
-                log.debug(f'Cancelling: {task}')
+                log.debug('Cancelling: %s', task)
                 task.cancel()
 
             log.debug('Running loop until remaining futures return...')
@@ -202,7 +208,7 @@ class Runner:
         else:
             for c in backend_coroutines:
                 task = self.loop.create_task(c())
-                task.add_done_callback(self.handler)
+                task.add_done_callback(self.backend_coroutine_handler)
 
     def _start_event_loop(self):
         if asyncio._get_running_loop() is not None:
@@ -211,6 +217,7 @@ class Runner:
         self._loop = asyncio.events.new_event_loop()
         asyncio.events.set_event_loop(self._loop)
         self._event = Event()
+        self._ready = Event()
 
     async def _yield(self):
         """Since the workflow is a simple synchronous class, it will just
@@ -220,10 +227,13 @@ class Runner:
         reduces the cpu load of the runner while idle by not constantly
         checking the workflow for new tasks. """
         delay = self.throttle * (self._workflow_len or 0)
-        log.debug(f'Yield for {delay}s or when next future returns')
+        log.debug('Yield for %ss or when next future returns', delay)
 
+        # The workflow was just checked, so only futures that return from
+        # here on can make new tasks ready
+        self._ready.clear()
         try:
-            await self.wait_for_next_task_future(timeout=delay)
+            await asyncio.wait_for(self._ready.wait(), timeout=delay)
         except asyncio.TimeoutError:
             pass
 
@@ -231,7 +241,7 @@ class Runner:
         await self._conc_sem.acquire()
         future = self.loop.create_task(self.backend.spawn(task))
         future.add_done_callback(self.handler)
-        self._futures.append(future)
+        self._futures.add(future)
 
     def process_exec_directives(self, task):
         exec_directive = task.directives.get('exec')
@@ -264,13 +274,32 @@ class Runner:
 
         log.info(f'Total run time: {datetime.now() - self._run_started}')
 
+    def backend_coroutine_handler(self, future):
+        """Callback added to backend coroutines. These are not task futures,
+        they never hold a slot in the concurrency semaphore, but if one of
+        them fails the run cannot continue. Backend coroutines are cancelled
+        during a normal shutdown, so that is not treated as an error."""
+        try:
+            future.result()
+        except asyncio.CancelledError:
+            pass
+        except KeyboardInterrupt:
+            self._errs = True
+        except Exception:
+            log.exception(f'Unhandled exception in a backend coroutine: {future}')
+            self._errs = True
+            if self._main and not self._main.cancelled():
+                self._main.cancel()
+        finally:
+            self.notify_waiters()
+
     def handler(self, future):
         """Callback added to task futures when they are spawned"""
         try:
             res = future.result()
             if isinstance(res, jetstream.Task):
                 if res.is_failed():
-                    log.debug(f'Skipping descendants for: {res.name}')
+                    log.debug('Skipping descendants for: %s', res.name)
                     self._workflow_iterator.graph.skip_descendants(res)
         except (KeyboardInterrupt, asyncio.CancelledError):
             self._errs = True
@@ -281,7 +310,7 @@ class Runner:
         finally:
             self.notify_waiters()
             self._conc_sem.release()
-            self._futures.remove(future)
+            self._futures.discard(future)
 
     def set_environment_variables(self):
         if self.pipeline:
@@ -328,7 +357,7 @@ class Runner:
                 self.loop.run_until_complete(self._main)
             finally:
                 self._cleanup_event_loop()
-                log.debug(f'Runner finished shutdown, errs={self._errs}')
+                log.debug('Runner finished shutdown, errs=%s', self._errs)
 
                 if self._errs:
                     self.backend.cancel()
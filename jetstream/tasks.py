@@ -21,6 +21,9 @@ VALID_STATES = (
     'skipped'
 )
 
+DONE_STATES = frozenset(('complete', 'failed', 'skipped'))
+FAILED_STATES = frozenset(('failed', 'skipped'))
+
 
 class TaskDirectiveProcessor:
     """Returns a callable that will preprocess known task directives. This
@@ -171,7 +174,7 @@ class Task:
 
     def reset(self, clear_state=True):
         """Reset the state of this task"""
-        log.debug(f'Reset: {self}')
+        log.debug('Reset: %s', self)
         self.status = 'new'
 
         if clear_state:
@@ -181,7 +184,7 @@ class Task:
         """Set task status to pending
         Pending status indicates that the task has been passed to the runner
         and will be started soon. """
-        log.debug(f'Pending: {self}')
+        log.debug('Pending: %s', self)
         self.status = 'pending'
         self._set_start_time()
 
@@ -193,7 +196,7 @@ class Task:
         :param force: Ignore any remaining retry attempts
         :return:
         """
-        log.debug(f'Failed: {self}')
+        log.debug('Failed: %s', self)
         atts = self.state.get('remaining_attempts', 0)
         if atts and not force:
             self.reset()
@@ -205,13 +208,13 @@ class Task:
 
     def skip(self, **reasons):
         """Failed by the system due to dependencies or other reasons"""
-        log.debug(f'Skipped: {self}')
+        log.debug('Skipped: %s', self)
         self.state.update(**reasons)
         self.status = 'skipped'
 
     def complete(self, returncode=None):
         """Indicate that this task is complete"""
-        log.debug(f'Complete: {self}')
+        log.debug('Complete: %s', self)
         self.status = 'complete'
         self._set_done_time()
 
@@ -231,7 +234,7 @@ class Task:
             return False
 
     def is_done(self):
-        if self.status in ('complete', 'failed', 'skipped'):
+        if self.status in DONE_STATES:
             return True
         else:
             return False
@@ -243,7 +246,7 @@ class Task:
             return False
 
     def is_failed(self):
-        if self.status in ('failed', 'skipped'):
+        if self.status in FAILED_STATES:
             return True
         else:
             return False
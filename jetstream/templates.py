@@ -1,5 +1,6 @@
 """Initiate a Jinja2 environment with template loaders that search
 locations set by arguments or environment variables. """
+import functools
 import json
 import hashlib
 import logging
@@ -95,9 +96,20 @@ def urlparse(value):
 
 
 def sha256(value):
-    """Allow "{{ value|sha256 }}" to be used in templates"""
-    h = hashlib.sha256(value.encode())
-    return h.hexdigest()
+    """Allow "{{ value|sha256 }}" to be used in templates. Bytes are hashed
+    as they are, anything else is hashed as utf-8 encoded text."""
+    if not isinstance(value, bytes):
+        value = value.encode()
+    return hashlib.sha256(value).hexdigest()
+
+
+def blake2b(value):
+    """Allow "{{ value|blake2b }}" to be used in templates. This is faster
+    than sha256 on most hardware, and can be used anywhere a hash is only
+    needed as a stable label for a value."""
+    if not isinstance(value, bytes):
+        value = value.encode()
+    return hashlib.blake2b(value).hexdigest()
 
 
 def fromjson(value):
@@ -146,22 +158,36 @@ def environment(*searchpath, strict=True, trim_blocks=True, lstrip_blocks=True):
     env.filters['dirname'] = dirname
     env.filters['urlparse'] = urlparse
     env.filters['sha256'] = sha256
+    env.filters['blake2b'] = blake2b
     return env
 
 
+_cached_environment = functools.lru_cache(maxsize=32)(environment)
+
+
+def shared_environment(*searchpath, **kwargs):
+    """Returns an environment that is shared by every caller using the same
+    search path and options. Reusing the environment keeps Jinja2's cache of
+    compiled templates. Search paths are made absolute so that the shared
+    environment is not affected by changes to the working directory. Call
+    environment() instead to get an environment that can be modified."""
+    searchpath = tuple(os.path.abspath(p) for p in searchpath)
+    return _cached_environment(*searchpath, **kwargs)
+
+
 def load_template(path, *searchpath, **kwargs):
     """Helper function to quickly load a template from a file. Remaining args and kwargs
-    are passed to jetstream.templates.environment() """
+    are passed to jetstream.templates.shared_environment() """
     template_dir = os.path.dirname(path)
     template_name = os.path.basename(path)
-    env = environment(template_dir, *searchpath, **kwargs)
+    env = shared_environment(template_dir, *searchpath, **kwargs)
     return env.get_template(template_name)
 
 
 def from_string(data, *searchpath, **kwargs):
     """Helper function to quickly load a template from a string. Remaining args and kwargs
-    are passed to jetstream.templates.environment() """
-    env = environment(*searchpath, **kwargs)
+    are passed to jetstream.templates.shared_environment() """
+    env = shared_environment(*searchpath, **kwargs)
     return env.from_string(data)
 
 
@@ -187,7 +213,7 @@ def render_template(template, project=None, pipeline=None, command_args=None):
 
 def load_workflow(render):
     """Given a rendered template string, loads the tasks and returns a workflow"""
-    log.debug(f'Parsing tasks from render:\n{render}')
+    log.debug('Parsing tasks from render:\n%s', render)
     tasks = jetstream.utils.parse_yaml(render)
 
     if not tasks:
@@ -1,15 +1,18 @@
 """Shared utilities"""
 import builtins
 import confuse
+import contextlib
+import copy
 import csv
 import fnmatch
+import functools
 import gzip
 import importlib
 import io
 import json
 import logging
 import os
-import subprocess
+import re
 import sys
 import yaml
 from collections.abc import Sequence, Mapping
@@ -24,15 +27,28 @@ import jetstream
 sentinel = object()
 log = logging.getLogger(__name__)
 
+# Use the libyaml bindings when PyYaml was built with them, they are much
+# faster than the pure Python loader and dumper
+yaml_loader = getattr(yaml, 'CSafeLoader', yaml.SafeLoader)
+yaml_dumper = getattr(yaml, 'CDumper', yaml.Dumper)
+
+
+@functools.lru_cache(maxsize=None)
+def _system_info():
+    """User and hostname do not change while the process is running, so
+    they are only looked up by the first Fingerprint"""
+    return getuser(), gethostname()
+
 
 class Fingerprint:
     """Generate a snapshot of the system info."""
     def __init__(self, note=None, id=None, pid=False):
+        user, hostname = _system_info()
         self.datetime = datetime.utcnow().isoformat()
-        self.user = getuser()
+        self.user = user
         self.version = str(jetstream.__version__)
         self.args = ' '.join(sys.argv)
-        self.hostname = gethostname()
+        self.hostname = hostname
         self.pwd = os.getcwd()
         self.note = str(note)
         self.id = id or jetstream.guid()
@@ -189,13 +205,14 @@ def dumps_json(obj, *args, sort_keys=True, **kwargs):
 
 def dump_yaml(obj, stream):
     """Attempt to dump `obj` to a YAML file"""
-    return yaml.dump(obj, stream=stream, default_flow_style=False)
+    return yaml.dump(
+        obj, stream=stream, Dumper=yaml_dumper, default_flow_style=False)
 
 
 def dumps_yaml(obj):
     """Attempt to dump `obj` to a YAML string"""
     stream = io.StringIO()
-    yaml.dump(obj, stream=stream, default_flow_style=False)
+    yaml.dump(obj, stream=stream, Dumper=yaml_dumper, default_flow_style=False)
     return stream.getvalue()
 
 
@@ -220,14 +237,22 @@ def guess_local_cpus( default=1):
 
 def guess_max_forks(default=500):
     """Returns 1/4 of current ulimit -u value. This leaves a good amount of
-    room for subprocesses to continue."""
+    room for subprocesses to continue. The limit is read with getrlimit, so
+    no shell needs to be forked to find it. The resource module is not
+    available on every platform, so it is only imported here."""
     try:
-        res = int(0.25 * int(subprocess.check_output('ulimit -u', shell=True)))
-        return res
-    except subprocess.CalledProcessError as e:
-        log.debug('Guessing max forks with ulimit -u failed, using default')
+        import resource
+        soft, hard = resource.getrlimit(resource.RLIMIT_NPROC)
+    except (ImportError, AttributeError, ValueError, OSError):
+        log.debug('Guessing max forks with getrlimit failed, using default')
         return default
 
+    if soft == resource.RLIM_INFINITY:
+        log.debug('Max user processes is unlimited, using default max forks')
+        return default
+
+    return int(0.25 * soft)
+
 
 def is_gzip(path, magic_number=b'\x1f\x8b'):
     """Returns True if the path is gzipped."""
@@ -282,14 +307,19 @@ def is_scalar(obj):
 def filter_records(records, criteria):
     """Given a list of mapping objects (`records`) and a criteria mapping,
     this function returns a list of objects that match filter criteria."""
+    criteria = tuple(criteria.items())
+    debug = log.isEnabledFor(logging.DEBUG)
     matches = list()
     for i in records:
-        for k, v in criteria.items():
-            if k not in i:
-                log.debug('Drop "{}" due to "{}" not in doc'.format(i, k))
+        for k, v in criteria:
+            value = i.get(k, sentinel)
+            if value is sentinel:
+                if debug:
+                    log.debug('Drop "%s" due to "%s" not in doc', i, k)
                 break
-            if i[k] != v:
-                log.debug('Drop "{}" due to "{}" not == "{}"'.format(i, k, v))
+            if value != v:
+                if debug:
+                    log.debug('Drop "%s" due to "%s" not == "%s"', i, k, v)
                 break
         else:
             matches.append(i)
@@ -297,13 +327,40 @@ def filter_records(records, criteria):
 
 
 def find(path, name=None):
-    """Similar to BSD find, finds files matching name pattern."""
-    for dirname, subdirs, files in os.walk(path):
-        for f in files:
-            if name is None:
-                yield os.path.join(dirname, f)
-            elif fnmatch.fnmatch(f, name):
-                yield os.path.join(dirname, f)
+    """Similar to BSD find, finds files matching name pattern.
+    Directories are listed with os.scandir, the entry types come back with
+    the listing so no extra stat is needed for each file. Like os.walk,
+    symlinks to directories are not followed and unreadable directories
+    are skipped."""
+    if name is not None:
+        match = re.compile(fnmatch.translate(name)).match
+    else:
+        match = None
+
+    # Directories still to be listed, this is walked depth-first in the
+    # same order that os.walk would visit them
+    stack = [path, ]
+    while stack:
+        try:
+            entries = os.scandir(stack.pop())
+        except OSError:
+            continue
+
+        subdirs = []
+        with entries:
+            for entry in entries:
+                try:
+                    is_dir = entry.is_dir()
+                except OSError:
+                    is_dir = False
+
+                if is_dir:
+                    if not entry.is_symlink():
+                        subdirs.append(entry.path)
+                elif match is None or match(entry.name):
+                    yield entry.path
+
+        stack.extend(reversed(subdirs))
 
 
 def parse_bool(data):
@@ -335,12 +392,21 @@ def parse_table(data, dialect='unix', headers=True, ordered=False):
     """Attempts to load a table file in any format. Returns a list of 
     dictionaries (or list of lists if no header is available). This requires 
     does not handle comment lines."""    
+    # The csv module reads lines straight from the data, this avoids
+    # splitting a copy of every line up front and keeps newlines that are
+    # quoted inside of fields. Open files (opened with newline='') can be
+    # given directly to parse rows while they are read.
+    if isinstance(data, str):
+        lines = io.StringIO(data, newline='')
+    else:
+        lines = data
+
     if headers:
-        rows = csv.DictReader(data.splitlines(), dialect=dialect)
+        rows = csv.DictReader(lines, dialect=dialect)
         if not ordered:
-            rows = [dict(r) for r in rows]
+            return [dict(r) for r in rows]
     else:
-        rows = csv.reader(data.splitlines(), dialect=dialect)
+        rows = csv.reader(lines, dialect=dialect)
 
     return list(rows)
 
@@ -361,7 +427,7 @@ def parse_txt(data):
 
 
 def parse_yaml(data):
-    return yaml.safe_load(data)
+    return yaml.load(data, Loader=yaml_loader)
 
 
 def _load(path):
@@ -370,6 +436,11 @@ def _load(path):
         return fp.read()
 
 
+def _load_table(path, dialect, headers):
+    with open(path, 'r', newline='') as fp:
+        return parse_table(fp, dialect=dialect, headers=headers)
+
+
 def load_file(path, filetype=None):
     """Attempts to load a data file from path, raises :ValueError
     if an suitable loader function is not found in loaders"""
@@ -390,22 +461,22 @@ def load_file(path, filetype=None):
 
 def load_tsv(path):
     """Load tsv with headers, returns list of dicts"""
-    return parse_tsv(_load(path))
+    return _load_table(path, dialect='excel-tab', headers=True)
 
 
 def load_csv(path):
     """Load csv with headers, returns list of dicts"""
-    return parse_csv(_load(path))
+    return _load_table(path, dialect='unix', headers=True)
 
 
 def load_tsv_nh(path):
     """Load tsv with no header, returns list of lists"""
-    return parse_tsv_nh(_load(path))
+    return _load_table(path, dialect='excel-tab', headers=False)
 
 
 def load_csv_nh(path):
     """Load csv with no header, returns list of lists"""
-    return parse_csv_nh(_load(path))
+    return _load_table(path, dialect='unix', headers=False)
 
 
 def load_json(path):
@@ -418,37 +489,68 @@ def load_txt(path):
     return parse_txt(_load(path))
 
 
-def load_yaml(path):
-    """Load a yaml file from `path`"""
+@functools.lru_cache(maxsize=128)
+def _load_yaml_cached(path, mtime_ns, size):
     return parse_yaml(_load(path))
 
 
+def load_yaml(path):
+    """Load a yaml file from `path`. Parsed files are cached by path,
+    modification time, and size, so an unchanged file is only parsed once.
+    Each call returns a copy of the cached data that is safe to modify."""
+    path = os.path.abspath(path)
+    st = os.stat(path)
+    data = _load_yaml_cached(path, st.st_mtime_ns, st.st_size)
+    return copy.deepcopy(data)
+
+
+load_yaml.cache_clear = _load_yaml_cached.cache_clear
+
+
+@contextlib.contextmanager
+def open_allow_gzip(path, magic_number=b'\x1f\x8b'):
+    """Context manager that opens a text file for reading, handles gzipped
+    files. The file is only opened once, the gzip magic number is checked by
+    peeking at the buffered stream, so no bytes are lost when reading from a
+    pipe. GzipFile does not close file objects that it is given, so the
+    underlying file is closed here when the context exits."""
+    with open(path, 'rb') as raw:
+        if raw.peek(len(magic_number)).startswith(magic_number):
+            fp = io.TextIOWrapper(gzip.GzipFile(fileobj=raw), encoding='utf-8')
+        else:
+            fp = io.TextIOWrapper(raw)
+
+        with fp:
+            yield fp
+
+
+def iter_lines_allow_gzip(path, magic_number=b'\x1f\x8b'):
+    """Yields lines from line-separated text files, handles gzipped files and
+    recognizes universal newlines."""
+    with open_allow_gzip(path, magic_number) as fp:
+        for line in fp:
+            yield line.rstrip('\n')
+
+
 def read_lines_allow_gzip(path):
     """Reads line-separated text files, handles gzipped files and recognizes
-    universal newlines. This can cause bytes to be lost when reading from a
-    pipe. """
-    if is_gzip(path):
-        with gzip.open(path, 'rb') as fp:
-            data = fp.read().decode('utf-8')
-    else:
-        with open(path, 'r') as fp:
-            data = fp.read()
-    lines = data.splitlines()
-    return lines
+    universal newlines. Lines are read one at a time, so the whole file is
+    never held in memory as a single string. Use iter_lines_allow_gzip to
+    avoid building the list of lines."""
+    return list(iter_lines_allow_gzip(path))
 
 
 def records_to_csv(records, outpath):
     """Writes records (list of dictionaries) out to a csv file"""
-    if os.path.exists(outpath):
-        raise FileExistsError(outpath)
-
     keys = set()
     for record in records:
-        keys = keys.union(set(record.keys()))
+        keys.update(record)
 
-    log.debug('Found keys: {}'.format(keys))
+    log.debug('Found keys: %s', keys)
 
-    with open(outpath, 'w') as fp:
+    # Exclusive mode raises FileExistsError if outpath is already present,
+    # and the csv module expects files to be opened with newline=''
+    with open(outpath, 'x', newline='') as fp:
         dw = csv.DictWriter(fp, keys)
         dw.writeheader()
         for record in records:
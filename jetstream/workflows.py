@@ -18,12 +18,14 @@ can be saved in files located in the config directory of project, or given as
 arguments to template.
 
 """
+import fnmatch
+import functools
+import itertools
 import logging
-import glob
+import os
 import pickle
 import random
 import re
-import shutil
 from collections import Counter, deque
 from datetime import datetime
 from distutils.version import LooseVersion
@@ -33,6 +35,7 @@ from jetstream import utils
 from jetstream.tasks import Task
 
 log = logging.getLogger(__name__)
+regex_special_chars = frozenset('.^$*+?{}[]|()\\')
 
 
 class Workflow:
@@ -59,8 +62,11 @@ class Workflow:
             return self.tasks.__getitem__(item.name)
 
     def __getstate__(self):
-        """Enables checking versions when workflows are loaded"""
-        return self.__dict__
+        """Enables checking versions when workflows are loaded. The graph is
+        rebuilt after loading, so it is left out of the saved state."""
+        state = self.__dict__.copy()
+        state['_graph'] = None
+        return state
 
     def __iter__(self):
         return iter(self.tasks.values())
@@ -98,15 +104,21 @@ class Workflow:
         fallback is set, it will be returned when no matches are found.
         Regex patterns are used by default. Set format to glob for glob
         patterns. """
-        log.debug(f'Find({style}): {pattern}')
+        log.debug('Find(%s): %s', style, pattern)
 
-        if style == 'exact':
-            matches = set(list(self.tasks.get(pattern, None)))
+        if style == 'exact' or (style == 'regex' and is_literal(pattern)):
+            # Patterns without regex special characters can only match the
+            # task with that exact name
+            task = self.tasks.get(pattern)
+            matches = {task, } if task is not None else set()
         elif style == 'regex':
             regex = compile(pattern)
-            matches = set([t for t in self if regex.match(t.name)])
+            matches = {t for t in self if regex.match(t.name)}
         elif style == 'glob':
-            matches = set([t for t in self if glob.fnmatch.fnmatch(t.name, pattern)])
+            # Translating the glob once avoids the per-name overhead of
+            # fnmatch, task names are always matched case-sensitively
+            regex = re.compile(fnmatch.translate(pattern))
+            matches = {t for t in self if regex.match(t.name)}
         else:
             msg = f'Unrecognized pattern style: {style}'
             raise ValueError(msg)
@@ -212,17 +224,33 @@ class WorkflowGraph:
         self.G = nx.DiGraph()
         self.nodes = self.G.nodes
         self.edges = self.G.edges
+        self._output_matches = {}
+        self._outputs = {}
 
         for name, task in workflow.tasks.items():
             self.G.add_node(name)
 
+            # Index the tasks by output so input directives can find them
+            # without scanning every task in the workflow
+            for output in task.directives['output']:
+                try:
+                    self._outputs.setdefault(output, []).append(name)
+                except TypeError:
+                    # Unhashable outputs can only be equal to unhashable
+                    # inputs, and those are matched by _find_outputs
+                    continue
+
+        # Edges are collected for the whole workflow and added in one batch
+        edges = []
         for name, task in workflow.tasks.items():
             try:
-                self._make_edges(task)
+                edges.extend(self._make_edges(task))
             except ValueError as e:
                 err = f'While adding edges for: {task}\n{e}'
                 raise ValueError(err) from None
 
+        self.G.add_edges_from(edges)
+
         if not nx.is_directed_acyclic_graph(self.G):
             cycles = nx.find_cycle(self.G)
             raise ValueError(f'Not a DAG! Possible causes:{list(cycles)}')
@@ -230,7 +258,7 @@ class WorkflowGraph:
     def __iter__(self):
         return WorkflowGraphIterator(self)
 
-    def _add_edge(self, f, t):
+    def _check_edge(self, f, t):
         """Edges represent dependencies between tasks. Edges run FROM one node
         TO another dependent node. Nodes can have multiple edges, but not
         multiple instances of the same edge (multigraph).
@@ -240,21 +268,23 @@ class WorkflowGraph:
 
         This means that the in-degree of a node represents the number of
         dependencies it has. A node with zero in-edges is a "root" node, or a
-        task with no dependencies. """
-        log.debug(f'Adding edge: {f} -> {t}')
+        task with no dependencies.
+
+        Returns False for edges from a task to itself, which are ignored, and
+        raises ValueError if either task is not in the workflow. """
+        log.debug('Adding edge: %s -> %s', f, t)
         if f == t:
-            return
+            return False
 
         if f not in self.G:
             err = f'"{f}" is not in the workflow!'
             raise ValueError(err)
 
         if t not in self.G:
-            err = f'"{f}" is not in the workflow!'
+            err = f'"{t}" is not in the workflow!'
             raise ValueError(err)
 
-        self.G.add_edge(f, t)
-
+        return True
 
     def _make_edges(self, task):
         """Generate edges based on the floww directives of a task.
@@ -264,62 +294,113 @@ class WorkflowGraph:
              input: task <------  target
 
         Note: output directives do not create edges but serve as the targets of
-        the input directives for other tasks
+        the input directives for other tasks. The directives are gathered into
+        one pass over the dependencies of the task, and one pass over the
+        dependents.
         """
-        log.debug(f'Adding edges for {task}')
-
-        for name in task.directives['after']:
-            self._add_edge(name, task.name)
-
-        for name in task.directives['before']:
-            self._add_edge(task.name, name)
-
-        for file in task.directives['input']:
-            for other_task in self.workflow:
-                if file in other_task.directives['output']:
-                    self._add_edge(other_task.name, task.name)
-
-        for pattern in task.directives['after-re']:
-            pattern = compile(pattern)
-            for other_task in self.workflow:
-                if pattern.match(other_task.name):
-                    self._add_edge(other_task.name, task.name)
-
-        for pattern in task.directives['before-re']:
-            pattern = compile(pattern)
-            for other_task in self.workflow:
-                if pattern.match(other_task.name):
-                    self._add_edge(task.name, other_task.name)
-
-        for pattern in task.directives['input-re']:
-            pattern = compile(pattern)
-            for other_task in self.workflow:
-                for output in other_task.directives['output']:
-                    if pattern.match(output):
-                        self._add_edge(other_task.name, task.name)
+        log.debug('Adding edges for %s', task)
+        name = task.name
+        directives = task.directives
+
+        parents = itertools.chain(
+            directives['after'],
+            itertools.chain.from_iterable(
+                self._find_outputs(f) for f in directives['input']),
+            itertools.chain.from_iterable(
+                self._match_names(p) for p in directives['after-re']),
+            itertools.chain.from_iterable(
+                self._match_outputs(p) for p in directives['input-re']),
+        )
+
+        children = itertools.chain(
+            directives['before'],
+            itertools.chain.from_iterable(
+                self._match_names(p) for p in directives['before-re']),
+        )
+
+        for parent in parents:
+            if self._check_edge(parent, name):
+                yield parent, name
+
+        for child in children:
+            if self._check_edge(name, child):
+                yield name, child
+
+    def _match_names(self, pattern):
+        """Returns the task names matched by a regex directive pattern.
+        Patterns without any regex special characters can only match a
+        single name, so those are looked up directly instead of being tested
+        against every task in the workflow."""
+        if is_literal(pattern):
+            if pattern in self.workflow.tasks:
+                return [pattern, ]
+            else:
+                return []
+        else:
+            regex = compile(pattern)
+            return [name for name in self.workflow.tasks if regex.match(name)]
+
+    def _find_outputs(self, file):
+        """Returns the names of tasks with an output equal to an input
+        directive. Directive values are not required to be strings, anything
+        that cannot be looked up in the output index is compared with every
+        task's outputs instead."""
+        try:
+            return self._outputs.get(file, ())
+        except TypeError:
+            return [t.name for t in self.workflow
+                    if file in t.directives['output']]
+
+    def _match_outputs(self, pattern):
+        """Returns the names of tasks with any output matched by an input-re
+        pattern. Each distinct output is only tested once, and many tasks
+        tend to share the same input-re patterns, so the results are
+        memoized for the life of the graph."""
+        try:
+            return self._output_matches[pattern]
+        except KeyError:
+            pass
+
+        regex = compile(pattern)
+        names = {}
+        for output, tasks in self._outputs.items():
+            if regex.match(output):
+                names.update(dict.fromkeys(tasks))
+
+        names = list(names)
+        self._output_matches[pattern] = names
+        return names
+
+    # Nodes are task names, so these look tasks up in the workflow's task
+    # dict directly rather than going through Workflow.__getitem__
 
     def ancestors(self, task):
+        tasks = self.workflow.tasks
         for anc in nx.ancestors(self.G, task.name):
-            yield self.workflow[anc]
+            yield tasks[anc]
 
     def predecessors(self, task):
+        tasks = self.workflow.tasks
         for pre in self.G.predecessors(task.name):
-            yield self.workflow[pre]
+            yield tasks[pre]
 
     def descendants(self, task):
+        tasks = self.workflow.tasks
         for dep in nx.descendants(self.G, task.name):
-            yield self.workflow[dep]
+            yield tasks[dep]
 
     def successors(self, task):
+        tasks = self.workflow.tasks
         for suc in self.G.successors(task.name):
-            yield self.workflow[suc]
+            yield tasks[suc]
 
     def is_ready(self, task):
         if task.status != 'new':
             return False
 
-        for dep in self.predecessors(task):
-            if not dep.is_complete():
+        tasks = self.workflow.tasks
+        for pre in self.G.predecessors(task.name):
+            if not tasks[pre].is_complete():
                 return False
         else:
             return True
@@ -330,30 +411,98 @@ class WorkflowGraph:
 
 
 class WorkflowGraphIterator:
+    """Yields tasks from the graph as they become ready. Rather than testing
+    every task on each call, this keeps a count of the incomplete
+    dependencies for each task, and a queue of the tasks that are ready to
+    launch. Only the tasks that this iterator has handed out are checked for
+    changes, when one completes, its dependents are updated. If nothing is
+    in-flight, the counts are rebuilt from the current task states so changes
+    made outside of the runner are still picked up."""
     def __init__(self, graph):
         self.graph = graph
-        self.tasks = list(self.graph.workflow)
-        self.i = 0
+        self._unmet = {}
+        self._ready = deque()
+        self._running = {}
+        self._scan()
 
     def __iter__(self):
         return self
 
     def __next__(self):
-        while self.i < len(self.tasks):
-            task = self.tasks[self.i]
-            self.i += 1
+        tasks = self.graph.workflow.tasks
 
-            if self.graph.is_ready(task):
-                task.pending()
-                return task
+        while 1:
+            while self._ready:
+                task = tasks[self._ready.popleft()]
 
-        self.tasks = [t for t in self.tasks if not t.is_done()]
+                if self.graph.is_ready(task):
+                    task.pending()
+                    self._running[task.name] = None
+                    return task
 
-        if self.tasks:
-            self.i = 0
-            return None
-        else:
-            raise StopIteration
+            if self._running:
+                self._poll()
+
+                if self._ready:
+                    continue
+                elif self._running:
+                    return None
+
+            self._scan()
+
+            if self._ready:
+                continue
+            elif self._unmet:
+                return None
+            else:
+                raise StopIteration
+
+    def _scan(self):
+        """Rebuild the dependency counts and ready queue for all tasks that
+        are not done yet"""
+        tasks = self.graph.workflow.tasks
+        G = self.graph.G
+        self._unmet.clear()
+        self._ready.clear()
+        self._running.clear()
+
+        for name, task in tasks.items():
+            if task.is_done():
+                continue
+
+            unmet = sum(
+                1 for pre in G.predecessors(name)
+                if not tasks[pre].is_complete()
+            )
+            self._unmet[name] = unmet
+
+            if task.status == 'pending':
+                self._running[name] = None
+            elif unmet == 0 and task.status == 'new':
+                self._ready.append(name)
+
+    def _poll(self):
+        """Check the tasks that are in-flight for any status changes"""
+        tasks = self.graph.workflow.tasks
+        G = self.graph.G
+        changed = [n for n in self._running if tasks[n].status != 'pending']
+
+        for name in changed:
+            del self._running[name]
+            status = tasks[name].status
+
+            if status == 'complete':
+                self._unmet.pop(name, None)
+                for suc in G.successors(name):
+                    if suc in self._unmet:
+                        self._unmet[suc] -= 1
+                        if self._unmet[suc] == 0:
+                            self._ready.append(suc)
+            elif status == 'new':
+                # Failed tasks with attempts remaining are reset to new
+                self._ready.append(name)
+            else:
+                self._unmet.pop(name, None)
 
 
 def random_workflow(n=50, timeout=None, connectedness=3, trail=10):
@@ -408,7 +557,16 @@ def random_workflow(n=50, timeout=None, connectedness=3, trail=10):
     return wf
 
 
+def is_literal(pattern):
+    """Returns True if the pattern has no regex special characters"""
+    return not regex_special_chars.intersection(pattern)
+
+
+@functools.lru_cache(maxsize=1024)
 def compile(pattern):
+    """Compile an anchored regex for matching task names and outputs. Many
+    tasks usually share the same flow directive patterns, so the compiled
+    patterns are cached for the life of the process."""
     return re.compile('^{}$'.format(pattern))
 
 
@@ -421,17 +579,21 @@ def load_workflow(path):
 
 def save_workflow(workflow, path):
     """Save a workflow to the path"""
-    log.debug('Saving workflow: {}'.format(path))
+    log.debug('Saving workflow: %s', path)
 
     start = datetime.now()
     lock_path = path + '.lock'
 
+    # Protocol 4 frames the data for faster loading and is readable by every
+    # supported Python version, HIGHEST_PROTOCOL is not readable before 3.8
     with open(lock_path, 'wb') as fp:
-        pickle.dump(workflow, fp)
+        pickle.dump(workflow, fp, protocol=4)
 
-    shutil.move(lock_path, path)
+    # The lock file is always next to the destination, so a rename is enough
+    # to atomically replace the previous save.
+    os.replace(lock_path, path)
     elapsed = datetime.now() - start
-    log.debug('Workflow saved (after {}): {}'.format(elapsed, path))
+    log.debug('Workflow saved (after %s): %s', elapsed, path)
 
 
 def mash(G, H):
@@ -478,22 +640,22 @@ def mash(G, H):
     new = 0
     modified = 0
     modified_tasks = set()
+    g_tasks = G.tasks
     for name, h_task in H.tasks.items():
-        try:
-            g_task = G[name]
-        except KeyError:
-            log.debug(f'{h_task} not in G, adding to new workflow..')
+        g_task = g_tasks.get(name)
+        if g_task is None:
+            log.debug('%s not in G, adding to new workflow..', h_task)
             workflow.add(h_task)
             modified_tasks.add(name)
             new += 1
             continue
 
         if g_task.is_failed():
-            log.debug(f'{h_task} is failed in G, replacing in new workflow..')
+            log.debug('%s is failed in G, replacing in new workflow..', h_task)
             workflow.add(h_task, overwrite=True)
             modified_tasks.add(name)
         elif h_task.identity != g_task.identity:
-            log.debug(f'{h_task} has changed, replacing in new workflow..')
+            log.debug('%s has changed, replacing in new workflow..', h_task)
             workflow.add(h_task, overwrite=True)
             modified_tasks.add(name)
             modified += 1
@@ -502,11 +664,15 @@ def mash(G, H):
 
     log.debug('Identifying tasks that need to be reset...')
     graph = workflow.reload_graph()
-    all_affected = set()
-    for task in modified_tasks:
-        all_affected.add(task)
-        for t in nx.descendants(graph.G, task):
-            all_affected.add(t)
+    # Walk the descendants of all modified tasks at once, so tasks shared by
+    # several modified tasks are only visited a single time
+    all_affected = set(modified_tasks)
+    stack = list(modified_tasks)
+    while stack:
+        for t in graph.G.successors(stack.pop()):
+            if t not in all_affected:
+                all_affected.add(t)
+                stack.append(t)
 
     for t in all_affected:
         workflow.reset_task(workflow.tasks[t])
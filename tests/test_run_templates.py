@@ -30,6 +30,7 @@ local_tests = {
     "logging_1.jst": "templates can log to stderr with log global fn",
     "mapping_1.jst": "templates can include properties mapping at the top",
     "retry_1.jst": "tasks can include retry directive that allows tasks to fail and then be run again",
+    "script_1.jst": "executable scripts without a shebang are run by the shell",
     "stress_1.jst": "runs should not crash due to forking limits",
     "stress_2.jst": "runs should be able to process lots of concurrent tasks",
     "stress_3.jst": "tasks with no command should complete very fast",
@@ -0,0 +1,89 @@
+import jetstream
+from jetstream.backends import slurm
+from unittest import TestCase
+
+jetstream.settings.clear()
+jetstream.settings.read(user=False)
+
+
+def sacct_output(*rows, header=slurm.sacct_format):
+    lines = [header] + list(rows)
+    return '\n'.join(slurm.sacct_delimiter.join(r) for r in lines) + '\n'
+
+
+class SacctParserTests(TestCase):
+    def test_parse_job(self):
+        data = sacct_output(('42', 'COMPLETED', '0:0'))
+        jobs = slurm.parse_sacct(data)
+        self.assertEqual(jobs, {
+            '42': {
+                'JobID': '42',
+                'State': 'COMPLETED',
+                'ExitCode': '0:0',
+                '_steps': []
+            }
+        })
+
+    def test_parse_steps(self):
+        data = sacct_output(
+            ('42', 'FAILED', '1:0'),
+            ('42.batch', 'FAILED', '1:0'),
+            ('42.extern', 'COMPLETED', '0:0'),
+            ('43_1', 'COMPLETED', '0:0'),
+        )
+        jobs = slurm.parse_sacct(data)
+        self.assertEqual(jobs['42']['State'], 'FAILED')
+        self.assertEqual(
+            [s['JobID'] for s in jobs['42']['_steps']],
+            ['42.batch', '42.extern']
+        )
+        self.assertEqual(jobs['43'], {'_steps': [
+            {'JobID': '43_1', 'State': 'COMPLETED', 'ExitCode': '0:0'}
+        ]})
+
+    def test_parse_bad_job_id(self):
+        data = sacct_output(('notajob', 'COMPLETED', '0:0'))
+        self.assertEqual(slurm.parse_sacct(data), {})
+
+    def test_batch_job_status(self):
+        data = sacct_output(('42', 'FAILED', '2:0'))
+        job = slurm.SlurmBatchJob(42)
+        job.job_data = slurm.parse_sacct(data)['42']
+        self.assertTrue(job.is_done())
+        self.assertFalse(job.is_ok())
+        self.assertEqual(job.returncode(), 2)
+
+    def test_batch_job_status_missing_exit_code(self):
+        data = sacct_output(('42', 'COMPLETED', ''))
+        job = slurm.SlurmBatchJob(42)
+        job.job_data = slurm.parse_sacct(data)['42']
+        self.assertTrue(job.is_ok())
+        self.assertEqual(job.returncode(), 0)
+
+    def test_batch_job_not_done(self):
+        data = sacct_output(('42', 'RUNNING', '0:0'))
+        job = slurm.SlurmBatchJob(42)
+        job.job_data = slurm.parse_sacct(data)['42']
+        self.assertFalse(job.is_done())
+        self.assertRaises(ValueError, job.is_ok)
+
+    def test_parse_sacct_fields(self):
+        self.assertEqual(
+            slurm.parse_sacct_fields('NodeList'), ('NodeList',))
+        self.assertEqual(
+            slurm.parse_sacct_fields('JobID, Elapsed MaxRSS'),
+            ('JobID', 'Elapsed', 'MaxRSS'))
+        self.assertEqual(
+            slurm.parse_sacct_fields(['JobID', 'NodeList']),
+            ('JobID', 'NodeList'))
+        self.assertEqual(slurm.parse_sacct_fields('all'), 'all')
+        self.assertEqual(slurm.parse_sacct_fields(None), ())
+
+    def test_check_sacct_fields(self):
+        known = 'JobID JobName State\nElapsed  MaxRSS NodeList\n'.split()
+        self.assertEqual(
+            slurm.check_sacct_fields(('jobid', 'NodeList'), known),
+            ('JobID', 'NodeList'))
+        self.assertEqual(
+            slurm.check_sacct_fields(('Elapsed', 'NodeLst'), known),
+            ('Elapsed', ))
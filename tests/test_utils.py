@@ -1,3 +1,5 @@
+import gzip
+import os
 import string
 import jetstream
 import tempfile
@@ -32,6 +34,106 @@ class UtilsTests(TestCase):
         jetstream.utils.dict_update_dot_notation(self.og, 'something.nested.bar', 24)
         self.assertEqual(self.og, t)
 
+    def test_find(self):
+        with tempfile.TemporaryDirectory() as d:
+            os.makedirs(os.path.join(d, 'a', 'b'))
+            paths = [
+                os.path.join(d, 'foo.txt'),
+                os.path.join(d, 'a', 'bar.txt'),
+                os.path.join(d, 'a', 'b', 'baz.log'),
+            ]
+            for path in paths:
+                open(path, 'w').close()
+            os.symlink(os.path.join(d, 'a'), os.path.join(d, 'link'))
+
+            found = jetstream.utils.find(d)
+            self.assertEqual(sorted(found), sorted(paths))
+
+            found = jetstream.utils.find(d, name='*.txt')
+            self.assertEqual(sorted(found), sorted(paths[:2]))
+
+    def test_filter_records(self):
+        records = [
+            {'name': 'a', 'group': 1},
+            {'name': 'b', 'group': 2},
+            {'name': 'c'},
+            {'name': 'd', 'group': None},
+        ]
+        res = jetstream.utils.filter_records(records, {'group': 1})
+        self.assertEqual(res, records[:1])
+        res = jetstream.utils.filter_records(records, {'group': None})
+        self.assertEqual(res, records[3:])
+        res = jetstream.utils.filter_records(records, {})
+        self.assertEqual(res, records)
+
+    def test_read_lines_allow_gzip(self):
+        with tempfile.TemporaryDirectory() as d:
+            plain = os.path.join(d, 'lines.txt')
+            with open(plain, 'w', newline='') as fp:
+                fp.write('a\r\nb\rc\n\nd')
+
+            gzipped = os.path.join(d, 'lines.txt.gz')
+            with gzip.open(gzipped, 'wt', newline='') as fp:
+                fp.write('a\r\nb\rc\n\nd')
+
+            expected = ['a', 'b', 'c', '', 'd']
+            lines = jetstream.utils.read_lines_allow_gzip(plain)
+            self.assertEqual(lines, expected)
+            lines = jetstream.utils.read_lines_allow_gzip(gzipped)
+            self.assertEqual(lines, expected)
+            lines = jetstream.utils.iter_lines_allow_gzip(gzipped)
+            self.assertEqual(next(lines), 'a')
+            self.assertEqual(list(lines), expected[1:])
+            with jetstream.utils.open_allow_gzip(gzipped) as fp:
+                raw = fp.buffer.fileobj
+                self.assertEqual(fp.read(2), 'a\n')
+            self.assertTrue(fp.closed)
+            self.assertTrue(raw.closed)
+
+            with jetstream.utils.open_allow_gzip(plain) as fp:
+                raw = fp.buffer
+                self.assertEqual(fp.read(2), 'a\n')
+            self.assertTrue(raw.closed)
+
+    def test_records_to_csv(self):
+        records = [{'a': 'two\nlines', 'b': [1, 2]}, {'a': 'x'}]
+        with tempfile.TemporaryDirectory() as d:
+            path = os.path.join(d, 'records.csv')
+            jetstream.utils.records_to_csv(records, path)
+            loaded = jetstream.utils.load_csv(path)
+            self.assertEqual(loaded[0], {'a': 'two\nlines', 'b': '[1, 2]'})
+            self.assertEqual(loaded[1], {'a': 'x', 'b': ''})
+            self.assertRaises(
+                FileExistsError,
+                jetstream.utils.records_to_csv, records, path
+            )
+
+    def test_dumps_yaml_round_trip(self):
+        data = {'a': 'one line', 'b': 'two\nlines', 'c': [1, 2.5, None]}
+        text = jetstream.utils.dumps_yaml(data)
+        self.assertIn('b: |', text)
+        self.assertEqual(jetstream.utils.parse_yaml(text), data)
+
+    def test_load_yaml_cache(self):
+        with tempfile.TemporaryDirectory() as d:
+            path = os.path.join(d, 'data.yaml')
+            with open(path, 'w') as fp:
+                fp.write('foo: [1, 2]\n')
+
+            data = jetstream.utils.load_yaml(path)
+            data['foo'].append(3)
+            self.assertEqual(jetstream.utils.load_yaml(path), {'foo': [1, 2]})
+
+            with open(path, 'w') as fp:
+                fp.write('foo: [1, 2, 3, 4]\n')
+            self.assertEqual(
+                jetstream.utils.load_yaml(path), {'foo': [1, 2, 3, 4]})
+
+    def test_guess_max_forks(self):
+        forks = jetstream.utils.guess_max_forks(default=3)
+        self.assertIsInstance(forks, int)
+        self.assertGreater(forks, 0)
+
     def test_dict_lookup_dot_notation(self):
         d = {'status': 'new', 'state': {'slurm': {'something': 42}}}
         v = jetstream.utils.dict_lookup_dot_notation(d, 'status')
@@ -84,6 +186,12 @@ class UtilsLoaderParserTests(TestCase):
         self.run_parser_tst(data, parser, expected)
         self.run_loader_tst(data, loader, expected)
 
+    def test_csv_quoted_newline(self):
+        data = 'foo,bar\r\n"two\nlines",42\r\n'
+        expected = [{'foo': 'two\nlines', 'bar': '42'}]
+        parser = jetstream.utils.parse_csv
+        self.run_parser_tst(data, parser, expected)
+
     def test_parse_csv_nh(self):
         data = "foo,bar\nbaz,42\napple,banana"
         expected = [
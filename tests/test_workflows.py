@@ -104,6 +104,24 @@ class WorkflowBasics(TestCase):
         results = wf.find('t.*')
         self.assertIn(t, results)
 
+    def test_find_by_exact_id(self):
+        wf = jetstream.Workflow()
+        t1 = wf.new_task(name='task1')
+        wf.new_task(name='task10')
+        self.assertEqual(wf.find('task1'), {t1})
+        self.assertEqual(wf.find('task1', style='exact'), {t1})
+        self.assertEqual(wf.find('task', style='exact', fallback=None), None)
+        self.assertRaises(ValueError, wf.find, 'task')
+
+    def test_find_by_glob(self):
+        wf = jetstream.Workflow()
+        t1 = wf.new_task(name='task_1')
+        t2 = wf.new_task(name='task_2')
+        wf.new_task(name='other')
+        self.assertEqual(wf.find('task_*', style='glob'), {t1, t2})
+        self.assertEqual(wf.find('task_[2]', style='glob'), {t2})
+        self.assertRaises(ValueError, wf.find, 'Task_*', style='glob')
+
     def test_find_by_id_fallback(self):
         wf = jetstream.Workflow()
         self.assertEqual(wf.find('.*', fallback=None), None)
@@ -175,6 +193,36 @@ class WorkflowDependencies(TestCase):
         deps = set(wf.graph.predecessors(t1))
         self.assertEqual(deps, {t2,})
 
+    def test_neg_add_task_w_before_missing(self):
+        wf = jetstream.Workflow()
+        wf.new_task(name='task1', before='missing')
+        with self.assertRaisesRegex(ValueError, '"missing" is not in'):
+            wf.reload_graph()
+
+    def test_add_task_w_after_re(self):
+        wf = jetstream.Workflow()
+        t1 = wf.new_task(name='task1')
+        t2 = wf.new_task(name='task2')
+        t4 = wf.new_task(name='task4', **{'after-re': 'task[12]'})
+        t5 = wf.new_task(name='task5', **{'after-re': ['task4', 'missing']})
+        self.assertEqual(set(wf.graph.predecessors(t4)), {t1, t2})
+        self.assertEqual(set(wf.graph.predecessors(t5)), {t4, })
+
+    def test_add_task_w_before_re(self):
+        wf = jetstream.Workflow()
+        t1 = wf.new_task(name='task1')
+        t2 = wf.new_task(name='task2', **{'before-re': 'task1'})
+        self.assertEqual(set(wf.graph.predecessors(t1)), {t2, })
+
+    def test_add_task_w_input_re(self):
+        wf = jetstream.Workflow()
+        t1 = wf.new_task(name='task1', output=['a.bam', 'a.bai'])
+        t2 = wf.new_task(name='task2', output='b.bam')
+        t3 = wf.new_task(name='task3', **{'input-re': r'.*\.ba.'})
+        t4 = wf.new_task(name='task4', **{'input-re': r'.*\.ba.'})
+        self.assertEqual(set(wf.graph.predecessors(t3)), {t1, t2})
+        self.assertEqual(set(wf.graph.predecessors(t4)), {t1, t2})
+
     def test_is_ready(self):
         wf = jetstream.Workflow()
         t1 = wf.new_task(name='task1')
@@ -253,6 +301,30 @@ class WorkflowDependencies(TestCase):
         t = wf3['in_common']
         self.assertTrue(t.is_complete())
 
+    def test_workflow_mash_resets_descendants(self):
+        wf1 = jetstream.Workflow()
+        wf1.new_task(name='task1', cmd='echo 1')
+        wf1.new_task(name='task2', cmd='echo 2', after='task1')
+        wf1.new_task(name='task3', cmd='echo 3', after='task2')
+        wf1.new_task(name='task4', cmd='echo 4')
+        for t in wf1:
+            t.complete()
+
+        wf2 = jetstream.Workflow()
+        wf2.new_task(name='task1', cmd='echo one')
+        wf2.new_task(name='task2', cmd='echo 2', after='task1')
+        wf2.new_task(name='task3', cmd='echo 3', after='task2')
+        wf2.new_task(name='task4', cmd='echo 4')
+
+        wf3 = jetstream.workflows.mash(wf1, wf2)
+        statuses = {t.name: t.status for t in wf3}
+        self.assertEqual(statuses, {
+            'task1': 'new',
+            'task2': 'new',
+            'task3': 'new',
+            'task4': 'complete',
+        })
+
 
 
 class WorkflowIteration(TestCase):
@@ -289,6 +361,41 @@ class WorkflowIteration(TestCase):
         t.complete()
         self.assertRaises(StopIteration, next, i)
 
+    def test_graph_iter_dependencies(self):
+        wf = jetstream.Workflow()
+        t1 = wf.new_task(name='task1', retry=1)
+        t2 = wf.new_task(name='task2', after='task1')
+        t3 = wf.new_task(name='task3', after='task2')
+        t4 = wf.new_task(name='task4')
+        i = iter(wf.graph)
+        self.assertIs(next(i), t1)
+        self.assertIs(next(i), t4)
+        self.assertIs(next(i), None)
+
+        # A failure with attempts remaining resets the task to new
+        t1.fail()
+        self.assertIs(next(i), t1)
+        t1.complete()
+        t4.complete()
+        self.assertIs(next(i), t2)
+        self.assertIs(next(i), None)
+
+        t2.fail()
+        wf.graph.skip_descendants(t2)
+        self.assertTrue(t3.is_skipped())
+        self.assertRaises(StopIteration, next, i)
+
+    def test_graph_iter_external_changes(self):
+        wf = jetstream.Workflow()
+        t1 = wf.new_task(name='task1')
+        t2 = wf.new_task(name='task2', after='task1')
+        t1.pending()
+        i = iter(wf.graph)
+        self.assertIs(next(i), None)
+
+        t1.complete()
+        self.assertIs(next(i), t2)
+
 
 class WorkflowSaving(TestCase):
     def setUp(self):
@@ -329,3 +436,15 @@ class WorkflowSaving(TestCase):
         self.assertTrue(wf2['task50'].is_complete())
         self.assertEqual(wf2['task42'].state.get('foo'), 'bar')
 
+
+    def test_load_rebuilds_graph(self):
+        wf = jetstream.Workflow()
+        t1 = wf.new_task(name='task1', cmd='echo task1')
+        t2 = wf.new_task(name='task2', cmd='echo task2', after='task1')
+        wf.reload_graph()
+
+        jetstream.save_workflow(wf, 'wf.pickle')
+        self.assertIsNotNone(wf._graph)
+
+        wf2 = jetstream.load_workflow('wf.pickle')
+        self.assertIn(t1, set(wf2.graph.predecessors(t2)))